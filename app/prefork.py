@@ -0,0 +1,153 @@
+"""
+Pre-fork Server - Forks uvicorn workers that share the imported runtime and one socket
+"""
+
+import gc
+import os
+import time
+import signal
+import socket
+import logging
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger("audio_denoise")
+
+
+class RestartLimiter:
+    """Allows at most `max_restarts` worker restarts within `window` seconds"""
+
+    def __init__(self, max_restarts: int = 5, window: float = 60.0):
+        self.max_restarts = max_restarts
+        self.window = window
+        self._restarts = deque()
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Record a restart; False once the crash rate exceeds the cap"""
+        now = time.monotonic() if now is None else now
+        while self._restarts and now - self._restarts[0] > self.window:
+            self._restarts.popleft()
+        if len(self._restarts) >= self.max_restarts:
+            return False
+        self._restarts.append(now)
+        return True
+
+
+def _run_worker(app, sock: socket.socket):
+    """Child process entry point: serve the app on the inherited socket"""
+    # Drop the parent's handlers; uvicorn installs its own for graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def serve(
+    app,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Optional[Callable[[], None]] = None,
+    restart_delay: float = 1.0,
+    restart_limiter: Optional[RestartLimiter] = None
+) -> int:
+    """
+    Run `preload` once, then fork `workers` children serving `app`.
+
+    What the children share copy-on-write is whatever the parent imported
+    before forking, mainly the TensorFlow runtime. Each child still loads and
+    warms its own copy of the model in the app's lifespan: TF's thread pools
+    do not survive a fork, so neither `preload` nor anything else in this
+    process may run TensorFlow ops.
+
+    Dead workers are respawned after `restart_delay`. If they keep crashing
+    faster than `restart_limiter` allows, all workers are stopped and 1 is
+    returned. SIGINT and SIGTERM are forwarded to every child.
+    """
+    logger.info(f"Forking {workers} workers...")
+    if preload:
+        preload()
+    restart_limiter = restart_limiter or RestartLimiter()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Move everything imported so far out of the collector's reach, so that
+    # GC passes in the children don't touch (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+    exit_code = 0
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, sock)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def stop_children():
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        stop_children()
+
+    previous_handlers = {
+        signum: signal.signal(signum, shutdown)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+
+    for index in range(workers):
+        spawn(index)
+
+    try:
+        while children:
+            try:
+                pid, exit_status = os.wait()
+            except ChildProcessError:
+                break
+
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {exit_status}")
+            if not restart_limiter.allow():
+                logger.error("Workers are crashing repeatedly, shutting down")
+                stopping = True
+                exit_code = 1
+                stop_children()
+                continue
+
+            time.sleep(restart_delay)
+            if not stopping:
+                spawn(index)
+    finally:
+        sock.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        logger.info("All workers stopped")
+
+    return exit_code
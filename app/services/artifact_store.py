@@ -0,0 +1,349 @@
+"""
+Artifact Store - Tiered storage for per-job temporary files
+"""
+
+import os
+import fcntl
+import shutil
+import itertools
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("audio_denoise")
+
+# Media types the API has always served, ahead of the platform's mimetypes table
+MEDIA_TYPES = {".wav": "audio/wav", ".png": "image/png", ".zip": "application/zip"}
+
+
+class Artifact:
+    """A stored artifact, held either in memory (`data`) or on disk (`path`)"""
+
+    def __init__(self, name: str, size: int, data: Optional[bytes] = None, path: Optional[str] = None):
+        self.name = name
+        self.size = size
+        self.data = data
+        self.path = path
+        self.media_type = (
+            MEDIA_TYPES.get(os.path.splitext(name)[1].lower())
+            or mimetypes.guess_type(name)[0]
+            or "application/octet-stream"
+        )
+
+    @property
+    def tier(self) -> str:
+        return "memory" if self.data is not None else "disk"
+
+
+class ArtifactStore:
+    """
+    Stores job artifacts in two tiers under a total byte quota.
+
+    Small artifacts go to an in-memory hot tier and are demoted to disk when
+    that tier fills up; everything else is written to `root/<job_id>/<name>`.
+    The store keeps a manifest of every job's artifacts with their sizes, so
+    usage is known without scanning the disk and deleting a job removes
+    everything it produced. Files written by producers through `reserve()`
+    are sized when they are handed back with `commit()`.
+
+    When the quota is exceeded, whole jobs are evicted least-recently-used
+    first, skipping those for which `is_evictable` returns False (e.g. still
+    processing), and `on_evict` is called for each evicted job.
+
+    With `shared=True` several processes (pre-forked workers) use the same
+    root. The memory tier is disabled, the manifest is rebuilt from disk
+    under a file lock before usage is computed or jobs are evicted, and a
+    job's recency is the mtime of its directory, so the quota covers every
+    worker's jobs. Hit, demotion and eviction counters stay per process.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        quota_bytes: int,
+        memory_bytes: int = 0,
+        memory_item_bytes: int = 0,
+        is_evictable: Optional[Callable[[str], bool]] = None,
+        on_evict: Optional[Callable[[str], None]] = None,
+        shared: bool = False
+    ):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.shared = shared
+        # A per-process memory tier would hide bytes from the other processes
+        self.memory_bytes = 0 if shared else memory_bytes
+        self.memory_item_bytes = memory_item_bytes
+        self.is_evictable = is_evictable or (lambda job_id: True)
+        self.on_evict = on_evict
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_path = os.path.join(self.root, ".lock")
+        self._memory: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._disk: Dict[str, Dict[str, int]] = {}
+        self._disk_used = 0
+        # Access order, from a counter so ties can't scramble the LRU order
+        self._clock = itertools.count(1)
+        self._last_access: Dict[str, int] = {}
+
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "demotions": 0,
+            "evictions": 0,
+            "evicted_bytes": 0
+        }
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store lock, plus the file lock shared with other processes"""
+        with self._lock:
+            outermost = self.shared and self._lock_depth == 0
+            self._lock_depth += 1
+            try:
+                if outermost:
+                    with open(self._lock_path, "a") as lock_file:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                        try:
+                            yield
+                        finally:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    yield
+            finally:
+                self._lock_depth -= 1
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    def _touch(self, job_id: str):
+        if self.shared:
+            # Recency has to be visible to the other processes
+            try:
+                os.utime(self._job_dir(job_id))
+            except FileNotFoundError:
+                pass
+        else:
+            self._last_access[job_id] = next(self._clock)
+
+    def _scan_job(self, job_id: str) -> Dict[str, int]:
+        """Sizes of a job's artifacts as found on disk"""
+        entries = {}
+        try:
+            with os.scandir(self._job_dir(job_id)) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            # e.g. a profile trace that is still being written
+                            entries[entry.name] = sum(
+                                os.path.getsize(os.path.join(dirpath, filename))
+                                for dirpath, _, filenames in os.walk(entry.path)
+                                for filename in filenames
+                            )
+                        else:
+                            entries[entry.name] = entry.stat().st_size
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _sync(self, job_id: Optional[str] = None):
+        """In shared mode, reload the manifest of one or every job from disk"""
+        if not self.shared:
+            return
+        if job_id is None:
+            self._disk = {}
+            self._last_access = {}
+            job_ids = self._job_dirs()
+        else:
+            job_ids = [job_id]
+
+        for owner in job_ids:
+            self._disk.pop(owner, None)
+            try:
+                self._last_access[owner] = os.stat(self._job_dir(owner)).st_mtime_ns
+            except FileNotFoundError:
+                self._last_access.pop(owner, None)
+                continue
+            self._disk[owner] = self._scan_job(owner)
+        self._disk_used = sum(sum(entries.values()) for entries in self._disk.values())
+
+    def _job_dirs(self) -> List[str]:
+        return [entry.name for entry in os.scandir(self.root) if entry.is_dir()]
+
+    def _record_disk(self, job_id: str, name: str, size: int):
+        """Update the manifest entry and running total for a disk artifact"""
+        entries = self._disk.setdefault(job_id, {})
+        self._disk_used += size - entries.get(name, 0)
+        entries[name] = size
+
+    def _write_disk(self, job_id: str, name: str, data: bytes):
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        with open(self.disk_path(job_id, name), "wb") as f:
+            f.write(data)
+        self._record_disk(job_id, name, len(data))
+
+    def disk_path(self, job_id: str, name: str) -> str:
+        """Location of an artifact in the disk tier"""
+        return os.path.join(self._job_dir(job_id), name)
+
+    def reserve(self, job_id: str, name: str) -> str:
+        """Get a disk path for a producer to write an artifact to"""
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        with self._locked():
+            self._touch(job_id)
+            self._disk.setdefault(job_id, {})
+        return self.disk_path(job_id, name)
+
+    def commit(self, job_id: str, name: str) -> int:
+        """Record the size of a file written to a reserved path"""
+        try:
+            size = os.path.getsize(self.disk_path(job_id, name))
+        except FileNotFoundError:
+            size = 0
+        with self._locked():
+            if size or name in self._disk.get(job_id, {}):
+                self._record_disk(job_id, name, size)
+        return size
+
+    def put_bytes(self, job_id: str, name: str, data: bytes):
+        """Store an artifact in memory if it is small enough, otherwise on disk"""
+        with self._locked():
+            self._touch(job_id)
+            if 0 < len(data) <= self.memory_item_bytes and len(data) <= self.memory_bytes:
+                key = (job_id, name)
+                if key in self._memory:
+                    self._memory_used -= len(self._memory.pop(key))
+                self._memory[key] = data
+                self._memory_used += len(data)
+                self._demote()
+            else:
+                self._write_disk(job_id, name, data)
+        self.enforce_quota()
+
+    def _demote(self):
+        """Move least-recently-used memory artifacts to disk until the tier fits"""
+        # Demotion moves bytes between tiers; it is not an access, so the
+        # job's recency is left alone
+        while self._memory_used > self.memory_bytes and self._memory:
+            (job_id, name), data = self._memory.popitem(last=False)
+            self._memory_used -= len(data)
+            self._write_disk(job_id, name, data)
+            self.counters["demotions"] += 1
+
+    def get(self, job_id: str, name: str) -> Optional[Artifact]:
+        """Look up an artifact in either tier"""
+        with self._locked():
+            data = self._memory.get((job_id, name))
+            if data is not None:
+                self._memory.move_to_end((job_id, name))
+                self._touch(job_id)
+                self.counters["memory_hits"] += 1
+                return Artifact(name, len(data), data=data)
+
+            path = self.disk_path(job_id, name)
+            if os.path.isfile(path):
+                self._touch(job_id)
+                self.counters["disk_hits"] += 1
+                return Artifact(name, os.path.getsize(path), path=path)
+
+            self.counters["misses"] += 1
+            return None
+
+    def manifest(self, job_id: str) -> List[dict]:
+        """List every artifact of a job with its tier and size"""
+        with self._locked():
+            self._sync(job_id)
+            entries = [
+                {"name": name, "tier": "memory", "size": len(data)}
+                for (owner, name), data in self._memory.items()
+                if owner == job_id
+            ]
+            entries.extend(
+                {"name": name, "tier": "disk", "size": size}
+                for name, size in self._disk.get(job_id, {}).items()
+            )
+        return entries
+
+    def job_ids(self) -> List[str]:
+        """Every job with artifacts, including directories left by other processes"""
+        with self._locked():
+            self._sync()
+            ids = {job_id for job_id, _ in self._memory}
+            ids.update(self._disk)
+        ids.update(self._job_dirs())
+        return sorted(ids)
+
+    def delete_job(self, job_id: str) -> int:
+        """Remove every artifact of a job and return the bytes freed"""
+        freed = 0
+        with self._locked():
+            self._sync(job_id)
+            for key in [key for key in self._memory if key[0] == job_id]:
+                data = self._memory.pop(key)
+                self._memory_used -= len(data)
+                freed += len(data)
+
+            disk_freed = sum(self._disk.pop(job_id, {}).values())
+            self._disk_used -= disk_freed
+            freed += disk_freed
+            self._last_access.pop(job_id, None)
+
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return freed
+
+    def usage(self) -> dict:
+        """Bytes used per tier"""
+        with self._locked():
+            self._sync()
+            return {"memory": self._memory_used, "disk": self._disk_used}
+
+    def enforce_quota(self):
+        """Evict least-recently-used jobs until total usage fits the quota"""
+        with self._locked():
+            self._sync()
+            total = self._memory_used + self._disk_used
+            if total <= self.quota_bytes:
+                return
+
+            known = {job_id for job_id, _ in self._memory} | set(self._disk)
+            for job_id in sorted(known, key=lambda j: self._last_access.get(j, 0)):
+                if total <= self.quota_bytes:
+                    break
+                if not self.is_evictable(job_id):
+                    continue
+                freed = self.delete_job(job_id)
+                total -= freed
+                self.counters["evictions"] += 1
+                self.counters["evicted_bytes"] += freed
+                logger.info(f"Evicted artifacts of job {job_id} ({freed} bytes)")
+                if self.on_evict:
+                    self.on_evict(job_id)
+
+            if total > self.quota_bytes:
+                logger.warning(f"Artifact quota exceeded: {total}/{self.quota_bytes} bytes in use")
+
+    def stats(self) -> dict:
+        """Usage and counters for the metrics endpoint"""
+        with self._locked():
+            self._sync()
+            jobs = {job_id for job_id, _ in self._memory} | set(self._disk)
+            return {
+                "shared": self.shared,
+                "worker_pid": os.getpid(),
+                "quota_bytes": self.quota_bytes,
+                "memory_quota_bytes": self.memory_bytes,
+                "memory_bytes": self._memory_used,
+                "disk_bytes": self._disk_used,
+                "total_bytes": self._memory_used + self._disk_used,
+                "jobs": len(jobs),
+                "memory_artifacts": len(self._memory),
+                **self.counters
+            }
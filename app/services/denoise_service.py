@@ -4,17 +4,23 @@ Denoise Service - Orchestrates audio denoising workflow
 
 import os
 import time
+import asyncio
 import logging
+import functools
 import numpy as np
 import librosa
 import librosa.display
-import soundfile as sf
 import matplotlib.pyplot as plt
 from typing import Callable, Optional
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import io
 
 from app.services.model_service import ModelService
+from app.services.artifact_store import ArtifactStore
+from app.services.profiling_service import JobProfiler
+from app.services.streaming import StreamingISTFT, LookAheadLimiter, StreamingWavWriter
 
 logger = logging.getLogger("audio_denoise")
 
@@ -22,20 +28,29 @@ logger = logging.getLogger("audio_denoise")
 class DenoiseService:
     """Service for audio denoising operations"""
     
-    def __init__(self, model_service: ModelService):
+    def __init__(self, model_service: ModelService, artifact_store: ArtifactStore):
         self.model_service = model_service
-        
-    def _generate_spectrogram_image(self, audio: np.ndarray, save_path: str):
-        """Generate a spectrogram image and save it"""
+        self.artifact_store = artifact_store
+        # Make-up gain on top of the input-peak level, applied before the
+        # output limiter; denoising usually takes 3-6 dB off the peaks
+        self.output_gain_db = float(os.getenv("OUTPUT_GAIN_DB", 6.0))
+        # Jobs run one at a time off the event loop, so status and stream
+        # requests are served while a job is processing
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="denoise")
+        
+    def _generate_spectrogram_image(self, audio: np.ndarray, job_id: str, name: str):
+        """Generate a spectrogram image and store it as a job artifact"""
         try:
             plt.figure(figsize=(10, 4))
             D = librosa.amplitude_to_db(np.abs(librosa.stft(audio)), ref=np.max)
             librosa.display.specshow(D, sr=16000, hop_length=128, x_axis='time', y_axis='hz')
             plt.axis('off')
             plt.tight_layout(pad=0)
-            plt.savefig(save_path, format='png', bbox_inches='tight', pad_inches=0, transparent=True)
+            buffer = io.BytesIO()
+            plt.savefig(buffer, format='png', bbox_inches='tight', pad_inches=0, transparent=True)
             plt.close()
-            logger.info(f"Spectrogram saved to {save_path}")
+            self.artifact_store.put_bytes(job_id, name, buffer.getvalue())
+            logger.info(f"Spectrogram {name} saved for job {job_id}")
         except Exception as e:
             logger.error(f"Error generating spectrogram: {e}")
 
@@ -44,11 +59,59 @@ class DenoiseService:
         input_path: str,
         output_path: str,
         job_id: str,
-        progress_callback: Optional[Callable[[float, str], None]] = None
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        profiler: Optional[JobProfiler] = None,
+        stream_callback: Optional[Callable[[int], None]] = None
     ) -> dict:
         """
-        Denoise an audio file with chunked inference to save memory
+        Denoise an audio file with chunked inference to save memory.
+        The output WAV grows as chunks finish; `stream_callback` receives the
+        number of samples readable from it after each write.
+        When a profiler is given, the whole run is traced into its directory.
         """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(
+                self._profiled_denoise,
+                input_path, output_path, job_id, progress_callback, profiler, stream_callback
+            )
+        )
+
+    def _profiled_denoise(
+        self,
+        input_path: str,
+        output_path: str,
+        job_id: str,
+        progress_callback: Optional[Callable[[float, str], None]],
+        profiler: Optional[JobProfiler],
+        stream_callback: Optional[Callable[[int], None]]
+    ) -> dict:
+        """Run the pipeline, under the profiler if one is given"""
+        if profiler is None:
+            return self._denoise(input_path, output_path, job_id, progress_callback, None, stream_callback)
+        
+        # Started on the worker thread, since cProfile only sees its own thread
+        profiler.start()
+        try:
+            return self._denoise(input_path, output_path, job_id, progress_callback, profiler, stream_callback)
+        finally:
+            # A broken trace must not replace the job's result or error
+            try:
+                profiler.stop()
+            except Exception as e:
+                logger.error(f"Error saving profile for job {job_id}: {e}")
+
+    def _denoise(
+        self,
+        input_path: str,
+        output_path: str,
+        job_id: str,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        profiler: Optional[JobProfiler] = None,
+        stream_callback: Optional[Callable[[int], None]] = None
+    ) -> dict:
+        """Run the denoising pipeline"""
         start_time = time.time()
         logger.info(f"Denoising job {job_id}: {input_path}")
         
@@ -72,20 +135,33 @@ class DenoiseService:
         original_length = len(audio)
         duration = float(original_length / 16000)
         
-        # Generate input spectrogram image
-        update_progress(20.0, "Generating visualization...")
-        input_spec_path = output_path.replace("_output.wav", "_input_spec.png")
-        self._generate_spectrogram_image(audio, input_spec_path)
-        
         # Preprocess (STFT, Normalize, Pad x32)
         update_progress(35.0, "Computing spectrogram...")
         spectrogram_input, metadata = self.model_service.preprocess(audio, 16000)
         logger.info(f"Preprocessed shape: {spectrogram_input.shape}")
         
-        # Run inference in CHUNKS to save memory on Render
+        # Run inference in CHUNKS to save memory on Render, reconstructing
+        # and writing each chunk's audio as soon as it leaves the model
         update_progress(50.0, "AI Inference (Chunked)...")
         _, freq, frames, chan = spectrogram_input.shape
-        spectrogram_output = np.zeros_like(spectrogram_input)
+        original_frames = metadata['original_frames']
+        
+        # The output's own peak is only known at the end, so level it as if
+        # the input's peak were at -1 dBFS, then add the make-up gain
+        input_peak = float(np.max(np.abs(audio)))
+        gain_db = self.output_gain_db
+        if input_peak > 0:
+            gain_db += -1.0 - 20 * np.log10(input_peak)
+        
+        istft = StreamingISTFT(self.model_service.n_fft, self.model_service.hop_length, original_frames)
+        limiter = LookAheadLimiter(16000, gain_db=gain_db, ceiling_db=-1.0)
+        writer = StreamingWavWriter(output_path, 16000)
+        denoised_blocks = []
+        
+        def write_output(samples: np.ndarray):
+            writer.write(samples)
+            if stream_callback and len(samples):
+                stream_callback(writer.samples_written)
         
         chunk_size = 128 # Multiple of 32
         num_chunks = int(np.ceil(frames / chunk_size))
@@ -104,12 +180,18 @@ class DenoiseService:
                     chunk = np.pad(chunk, ((0,0), (0,0), (0, padding), (0,0)))
                 
                 # Inference
-                chunk_out = self.model_service.predict(chunk)
-                if hasattr(chunk_out, 'numpy'):
-                    chunk_out = chunk_out.numpy()
+                with profiler.trace_predict(i) if profiler else nullcontext():
+                    chunk_out = self.model_service.predict(chunk)
+                    if hasattr(chunk_out, 'numpy'):
+                        chunk_out = chunk_out.numpy()
                 
-                # Assign back to output (slicing out any padding added for divisibility)
-                spectrogram_output[:, :, start:end, :] = chunk_out[:, :, :actual_w, :]
+                # Reconstruct this chunk (denormalize, drop time padding, ISTFT)
+                valid = min(end, original_frames) - start
+                if valid > 0:
+                    stft = self.model_service.postprocess_chunk(chunk_out, metadata, start, valid)
+                    block = istft.push(stft)
+                    denoised_blocks.append(block)
+                    write_output(limiter.process(block))
                 
                 # Update sub-progress
                 progress = 50 + (i / num_chunks) * 30
@@ -122,27 +204,25 @@ class DenoiseService:
             # Explicitly delete large input
             del spectrogram_input
             
+            block = istft.flush()
+            denoised_blocks.append(block)
+            write_output(limiter.process(block))
+            write_output(limiter.flush())
+            
         except Exception as e:
             logger.error(f"Inference error: {e}")
             raise RuntimeError(f"AI Model Error: {str(e)}")
+        finally:
+            writer.close()
         
-        # Postprocess (ISTFT, Denormalize, Crop)
-        update_progress(80.0, "Reconstructing audio...")
-        audio_denoised = self.model_service.postprocess(
-            spectrogram_output,
-            metadata,
-            original_length
-        )
-        logger.info("Reconstruction complete")
-        
-        # Explicitly delete large output spectrogram
-        del spectrogram_output
+        logger.info(f"Saved output to {output_path}")
+        audio_denoised = np.concatenate(denoised_blocks)
+        del denoised_blocks
         
-        # Generate output spectrogram image
+        # Generate spectrogram images once the audio is already available
         update_progress(85.0, "Finalizing visualization...")
-        output_spec_path = output_path.replace("_output.wav", "_output_spec.png")
-        self._generate_spectrogram_image(audio_denoised, output_spec_path)
-
+        self._generate_spectrogram_image(audio, job_id, "input_spec.png")
+        self._generate_spectrogram_image(audio_denoised, job_id, "output_spec.png")
         
         # Calculate real metrics from reference
         update_progress(90.0, "Calculating quality metrics...")
@@ -151,22 +231,6 @@ class DenoiseService:
         eps = 1e-10
         noise_reduction_db = 10 * np.log10((noisy_power + eps) / (denoised_power + eps))
         
-        # Save output
-        update_progress(95.0, "Exporting results...")
-        
-        # Apply Peak Normalization to -1dB
-        try:
-            peak = np.max(np.abs(audio_denoised))
-            if peak > 0:
-                target_peak = 10**(-1/20) # -1dB
-                audio_denoised = audio_denoised * (target_peak / peak)
-            logger.info("Applied -1dB peak normalization")
-        except Exception as e:
-            logger.warning(f"Normalization failed: {e}")
-
-        sf.write(output_path, audio_denoised, 16000)
-        logger.info(f"Saved output to {output_path}")
-        
         processing_time = time.time() - start_time
         
         update_progress(100.0, "Processing complete")
@@ -0,0 +1,126 @@
+"""
+Job Store - Tracks job status, shared between API worker processes
+"""
+
+import os
+import json
+import fcntl
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("audio_denoise")
+
+
+class InMemoryJobStore:
+    """Job store backed by a dict, visible to a single process only"""
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Get a snapshot of a job, or None if it does not exist"""
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def create(self, job: dict):
+        """Register a new job"""
+        self._jobs[job["job_id"]] = dict(job)
+
+    def update(self, job_id: str, fields: dict):
+        """Merge fields into an existing job; ignored if the job was deleted"""
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    def delete(self, job_id: str):
+        """Remove a job if it exists"""
+        self._jobs.pop(job_id, None)
+
+    def all(self) -> List[dict]:
+        """Get a snapshot of every job"""
+        return [dict(job) for job in self._jobs.values()]
+
+
+class FileJobStore:
+    """
+    Job store backed by one JSON file per job, so that every worker forked
+    from the same parent sees the same job state
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_path = os.path.join(self.directory, ".lock")
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    @contextmanager
+    def _locked(self):
+        """Serialize read-modify-write cycles across processes"""
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Corrupt job record {path}: {e}")
+            return None
+
+    def _write(self, job: dict):
+        # Write to a temp file and rename so readers never see a partial record
+        path = self._path(job["job_id"])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, job_id: str) -> bool:
+        return os.path.exists(self._path(job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Get a snapshot of a job, or None if it does not exist"""
+        return self._read(self._path(job_id))
+
+    def create(self, job: dict):
+        """Register a new job"""
+        with self._locked():
+            self._write(job)
+
+    def update(self, job_id: str, fields: dict):
+        """Merge fields into an existing job; ignored if the job was deleted"""
+        with self._locked():
+            job = self._read(self._path(job_id))
+            if job is None:
+                return
+            job.update(fields)
+            self._write(job)
+
+    def delete(self, job_id: str):
+        """Remove a job if it exists"""
+        with self._locked():
+            try:
+                os.remove(self._path(job_id))
+            except FileNotFoundError:
+                pass
+
+    def all(self) -> List[dict]:
+        """Get a snapshot of every job"""
+        jobs = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                job = self._read(entry.path)
+                if job is not None:
+                    jobs.append(job)
+        return jobs
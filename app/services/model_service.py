@@ -107,31 +107,23 @@ class ModelService:
         
         return input_tensor.astype(np.float32), metadata
 
-    def postprocess(
+    def postprocess_chunk(
         self,
         output: np.ndarray,
         metadata: dict,
-        original_length: int
+        start: int,
+        frames: int
     ) -> np.ndarray:
         """
-        Postprocess exactly as in reference code
+        Turn model output for `frames` frames starting at frame `start` back
+        into a complex spectrogram, ready for (streaming) inverse STFT
         """
-        # output shape: (1, 257, padded_frames, 1) or (257, padded_frames)
-        denoised_magnitude = np.squeeze(output)
+        # output shape: (1, 257, padded_width, 1); drop padding and denormalize
+        denoised_magnitude = output[0, :, :frames, 0] * metadata['magnitude_max']
         
-        # Remove padding and denormalize
-        frames = metadata['original_frames']
-        denoised_magnitude = denoised_magnitude[:, :frames]
-        denoised_magnitude *= metadata['magnitude_max']
-        
-        # Reconstruct complex spectrogram
-        phase = metadata['phase_pad'][:, :frames]
-        denoised_stft = denoised_magnitude * np.exp(1j * phase)
-        
-        # Inverse STFT
-        audio_denoised = librosa.istft(denoised_stft, hop_length=self.hop_length)
-        
-        return audio_denoised
+        # Reuse the noisy input's phase
+        phase = metadata['phase_pad'][:, start:start + frames]
+        return denoised_magnitude * np.exp(1j * phase)
     
     def predict(self, input_spectrogram: np.ndarray) -> np.ndarray:
         """Run model inference with structure matching"""
@@ -145,6 +137,20 @@ class ModelService:
             # Fallback for older models or different structures
             return self.model(input_spectrogram, training=False)
     
+    def warmup(self, frames: int = 128) -> bool:
+        """Run one dummy inference so graph tracing and allocations happen up front"""
+        if self.model is None:
+            return False
+
+        try:
+            dummy = np.zeros((1, self.n_fft // 2 + 1, frames, 1), dtype=np.float32)
+            self.predict(dummy)
+            print(f"Model warmed up ({frames} frames)")
+            return True
+        except Exception as e:
+            print(f"Model warmup failed: {e}")
+            return False
+
     def get_model_info(self) -> dict:
         """Get model information"""
         if self.model is None:
@@ -157,3 +163,4 @@ class ModelService:
             "input_shape": self.model.input_shape,
             "output_shape": self.model.output_shape
         }
+
@@ -0,0 +1,99 @@
+"""
+Profiling Service - Captures opt-in per-job performance traces
+"""
+
+import os
+import io
+import json
+import time
+import shutil
+import pstats
+import cProfile
+import logging
+from contextlib import contextmanager
+from typing import List, Optional
+
+import tensorflow as tf
+
+logger = logging.getLogger("audio_denoise")
+
+
+class JobProfiler:
+    """
+    Profiles a single denoise job.
+
+    Collects Python-level stacks with cProfile, TensorFlow op-level timing
+    through the TF profiler, and wall-clock timing of every `predict` call.
+    Everything is written to `trace_dir`, then bundled into a zip archive
+    next to it and the directory is removed.
+    """
+
+    def __init__(self, trace_dir: str):
+        self.trace_dir = trace_dir
+        self.archive_path: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._tf_tracing = False
+        self._predict_timings: List[dict] = []
+
+    def start(self):
+        """Start the Python and TensorFlow profilers"""
+        os.makedirs(self.trace_dir, exist_ok=True)
+
+        try:
+            tf.profiler.experimental.start(os.path.join(self.trace_dir, "tensorflow"))
+            self._tf_tracing = True
+        except Exception as e:
+            # Only one TF profiler session may run per process
+            logger.warning(f"TensorFlow profiler unavailable: {e}")
+
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    @contextmanager
+    def trace_predict(self, step: int):
+        """Time one model inference call and annotate it in the TF trace"""
+        start = time.perf_counter()
+        if self._tf_tracing:
+            with tf.profiler.experimental.Trace("predict", step_num=step, _r=1):
+                yield
+        else:
+            yield
+        self._predict_timings.append({
+            "step": step,
+            "seconds": time.perf_counter() - start
+        })
+
+    def stop(self) -> str:
+        """Stop profiling, write the trace files and return the archive path"""
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(os.path.join(self.trace_dir, "python.prof"))
+
+            # Human-readable summary alongside the raw pstats dump
+            summary = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=summary)
+            stats.sort_stats("cumulative").print_stats(50)
+            with open(os.path.join(self.trace_dir, "python_stats.txt"), "w") as f:
+                f.write(summary.getvalue())
+            self._profile = None
+
+        if self._tf_tracing:
+            try:
+                tf.profiler.experimental.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping TensorFlow profiler: {e}")
+            self._tf_tracing = False
+
+        total = sum(t["seconds"] for t in self._predict_timings)
+        with open(os.path.join(self.trace_dir, "predict_timings.json"), "w") as f:
+            json.dump({
+                "calls": len(self._predict_timings),
+                "total_seconds": total,
+                "timings": self._predict_timings
+            }, f, indent=2)
+
+        self.archive_path = shutil.make_archive(self.trace_dir, "zip", self.trace_dir)
+        # Only the archive is served; don't keep every trace twice
+        shutil.rmtree(self.trace_dir, ignore_errors=True)
+        logger.info(f"Profile trace saved to {self.archive_path}")
+        return self.archive_path
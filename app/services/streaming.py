@@ -0,0 +1,174 @@
+"""
+Streaming Utilities - Incremental reconstruction, gain and WAV output
+"""
+
+import wave
+import struct
+import numpy as np
+import librosa
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Size of the RIFF/fmt/data header written by the `wave` module for PCM audio
+WAV_HEADER_SIZE = 44
+
+
+class StreamingISTFT:
+    """
+    Inverse STFT fed a few frames at a time.
+
+    Produces the same samples as `librosa.istft(stft, hop_length=hop_length)`
+    with a centered Hann window, but emits each sample as soon as no later
+    frame can overlap it instead of waiting for the whole spectrogram.
+    """
+
+    def __init__(self, n_fft: int, hop_length: int, total_frames: int):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = librosa.filters.get_window("hann", n_fft, fftbins=True)
+        self.window_sq = self.window ** 2
+
+        # Positions are in the centered (padded) signal; the first n_fft // 2
+        # samples are padding and are never emitted
+        self._trim = n_fft // 2
+        self._end = self._trim + hop_length * max(total_frames - 1, 0)
+
+        self._frames_pushed = 0
+        self._emitted = self._trim
+        self._offset = 0
+        self._ola = np.zeros(n_fft, dtype=np.float64)
+        self._wss = np.zeros(n_fft, dtype=np.float64)
+
+    def _grow(self, length: int):
+        if length > len(self._ola):
+            extra = length - len(self._ola)
+            self._ola = np.concatenate([self._ola, np.zeros(extra)])
+            self._wss = np.concatenate([self._wss, np.zeros(extra)])
+
+    def _emit(self, until: int) -> np.ndarray:
+        until = min(until, self._end)
+        if until <= self._emitted:
+            return np.zeros(0, dtype=np.float32)
+
+        start = self._emitted - self._offset
+        stop = until - self._offset
+        y = self._ola[start:stop].copy()
+        wss = self._wss[start:stop]
+        nonzero = wss > np.finfo(wss.dtype).tiny
+        y[nonzero] /= wss[nonzero]
+        self._emitted = until
+
+        # Drop everything that has been emitted and cannot be touched again
+        self._ola = self._ola[stop:]
+        self._wss = self._wss[stop:]
+        self._offset = until
+        return y.astype(np.float32)
+
+    def push(self, stft_frames: np.ndarray) -> np.ndarray:
+        """Add complex STFT frames (freq, frames) and return finished samples"""
+        frames = np.fft.irfft(stft_frames, n=self.n_fft, axis=0) * self.window[:, None]
+        first = self._frames_pushed * self.hop_length - self._offset
+        self._grow(first + self.hop_length * (frames.shape[1] - 1) + self.n_fft)
+
+        for j in range(frames.shape[1]):
+            pos = first + j * self.hop_length
+            self._ola[pos:pos + self.n_fft] += frames[:, j]
+            self._wss[pos:pos + self.n_fft] += self.window_sq
+        self._frames_pushed += frames.shape[1]
+
+        # Samples before the start of the next frame are final
+        return self._emit(self._frames_pushed * self.hop_length)
+
+    def flush(self) -> np.ndarray:
+        """Return the remaining samples once every frame has been pushed"""
+        return self._emit(self._end)
+
+
+class LookAheadLimiter:
+    """
+    Streaming-safe replacement for peak normalization.
+
+    Applies a fixed gain, then a look-ahead peak limiter with a hard ceiling.
+    The gain curve is the moving minimum of the required gain, smoothed by a
+    moving average of the same width, so it ramps down before each peak and
+    back up after it. Output lags input by `2 * lookahead` samples.
+    """
+
+    def __init__(self, sample_rate: int, gain_db: float = 0.0, ceiling_db: float = -1.0, lookahead_ms: float = 5.0):
+        self.gain = 10 ** (gain_db / 20)
+        self.ceiling = 10 ** (ceiling_db / 20)
+        self.lookahead = max(int(sample_rate * lookahead_ms / 1000), 1)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._context = 0
+
+    def _moving_min(self, x: np.ndarray) -> np.ndarray:
+        padded = np.pad(x, self.lookahead, mode="edge")
+        return sliding_window_view(padded, 2 * self.lookahead + 1).min(axis=-1)
+
+    def _moving_mean(self, x: np.ndarray) -> np.ndarray:
+        width = 2 * self.lookahead + 1
+        padded = np.pad(x, self.lookahead, mode="edge")
+        cumsum = np.concatenate([[0.0], np.cumsum(padded, dtype=np.float64)])
+        return (cumsum[width:] - cumsum[:-width]) / width
+
+    def _run(self, final: bool) -> np.ndarray:
+        buffer = self._buffer
+        delay = 2 * self.lookahead
+        stop = len(buffer) if final else len(buffer) - delay
+        if stop <= self._context:
+            return np.zeros(0, dtype=np.float32)
+
+        required = np.minimum(1.0, self.ceiling / np.maximum(np.abs(buffer), 1e-12))
+        gain = self._moving_mean(self._moving_min(required))
+        out = np.clip(buffer[self._context:stop] * gain[self._context:stop], -self.ceiling, self.ceiling)
+
+        # Keep enough already-emitted samples to fill the next look-behind window
+        keep_from = max(stop - delay, 0)
+        self._buffer = buffer[keep_from:]
+        self._context = stop - keep_from
+        return out.astype(np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Feed samples and return the ones whose look-ahead window is complete"""
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32) * self.gain])
+        return self._run(final=False)
+
+    def flush(self) -> np.ndarray:
+        """Return all remaining samples at the end of the stream"""
+        return self._run(final=True)
+
+
+class StreamingWavWriter:
+    """16-bit mono WAV writer that makes each block readable as soon as it is written"""
+
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self.samples_written = 0
+        self._file = open(path, "wb")
+        self._wav = wave.open(self._file, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, samples: np.ndarray):
+        """Append samples in [-1, 1] and flush them to disk"""
+        if len(samples) == 0:
+            return
+        pcm = np.round(np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        self._wav.writeframesraw(pcm.tobytes())
+        self._file.flush()
+        self.samples_written += len(samples)
+
+    def close(self):
+        """Patch the header with the final length and close the file"""
+        self._wav.close()
+        self._file.close()
+
+
+def streaming_wav_header(sample_rate: int) -> bytes:
+    """WAV header for 16-bit mono audio of unknown length"""
+    unknown = 0xFFFFFFFF
+    return b"".join([
+        b"RIFF", struct.pack("<I", unknown), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16),
+        b"data", struct.pack("<I", unknown),
+    ])
@@ -7,6 +7,7 @@ export interface DenoiseResponse {
   status: string;
   message: string;
   check_status_url: string;
+  stream_url: string;
 }
 
 export interface JobStatus {
@@ -14,6 +15,7 @@ export interface JobStatus {
   status: 'idle' | 'pending' | 'processing' | 'completed' | 'error';
   progress: number;
   message: string;
+  evicted?: boolean;
   result?: {
     output_url: string;
     duration: number;
@@ -23,6 +25,7 @@ export interface JobStatus {
     processing_time: number;
     input_spec_url?: string;
     output_spec_url?: string;
+    profile_url?: string;
   };
 }
 
@@ -4,12 +4,15 @@ TensorFlow U-Net Audio Denoising API
 """
 
 import os
+import sys
 import uuid
+import random
 import tempfile
 import shutil
 import logging
 from datetime import datetime
 from typing import Optional
+from urllib.parse import quote
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import asyncio
@@ -23,8 +26,9 @@ load_dotenv()
 import numpy as np
 import librosa
 import soundfile as sf
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, status
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, BackgroundTasks, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -36,6 +40,7 @@ class ProcessingStatus(BaseModel):
     created_at: str
     completed_at: Optional[str] = None
     result: Optional[dict] = None
+    evicted: bool = False
 
 
 class HealthResponse(BaseModel):
@@ -56,9 +61,32 @@ class MetricsResponse(BaseModel):
     snr_improvement_avg: float
 
 
+class ArtifactStatsResponse(BaseModel):
+    # Byte totals cover every worker when shared; counters are per worker
+    shared: bool
+    worker_pid: int
+    quota_bytes: int
+    memory_quota_bytes: int
+    memory_bytes: int
+    disk_bytes: int
+    total_bytes: int
+    jobs: int
+    memory_artifacts: int
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    demotions: int
+    evictions: int
+    evicted_bytes: int
+
+
 # Import our services
 from app.services.denoise_service import DenoiseService
 from app.services.model_service import ModelService
+from app.services.job_store import InMemoryJobStore, FileJobStore
+from app.services.profiling_service import JobProfiler
+from app.services.streaming import WAV_HEADER_SIZE, streaming_wav_header
+from app.services.artifact_store import Artifact, ArtifactStore
 
 # Global service instances
 model_service: Optional[ModelService] = None
@@ -68,8 +96,91 @@ denoise_service: Optional[DenoiseService] = None
 TEMP_DIR = os.getenv("TEMP_DIR", tempfile.mkdtemp(prefix="audio_denoise_"))
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Job storage (in production, use Redis)
-job_store = {}
+# Number of pre-forked worker processes sharing the imported TensorFlow runtime
+WORKERS = int(os.getenv("WORKERS", 1))
+PREFORK = WORKERS > 1
+
+# Job storage (in production, use Redis). Forked workers share job state
+# through the temp directory so any worker can answer status requests.
+if PREFORK:
+    job_store = FileJobStore(os.path.join(TEMP_DIR, "jobs"))
+else:
+    job_store = InMemoryJobStore()
+
+# Fraction of jobs profiled even when the request does not ask for it
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))
+
+
+def is_evictable(job_id: str) -> bool:
+    """Artifacts of jobs that are still processing are never evicted"""
+    job = job_store.get(job_id)
+    return job is None or job["status"] != "processing"
+
+
+def mark_evicted(job_id: str):
+    """Let clients know a job's files were evicted to stay under the quota"""
+    job_store.update(job_id, {
+        "evicted": True,
+        "message": "Job files were evicted to free storage"
+    })
+
+
+# Job artifacts: a byte quota over an in-memory hot tier and a disk tier.
+# Forked workers share the disk tier and enforce the quota over all of it.
+artifact_store = ArtifactStore(
+    root=os.path.join(TEMP_DIR, "artifacts"),
+    quota_bytes=int(os.getenv("ARTIFACT_QUOTA_BYTES", 2 * 1024 ** 3)),
+    memory_bytes=int(os.getenv("ARTIFACT_MEMORY_BYTES", 64 * 1024 ** 2)),
+    memory_item_bytes=int(os.getenv("ARTIFACT_MEMORY_ITEM_BYTES", 1024 ** 2)),
+    is_evictable=is_evictable,
+    on_evict=mark_evicted,
+    shared=PREFORK
+)
+
+
+def artifact_response(artifact: Artifact, filename: Optional[str] = None) -> Response:
+    """Serve an artifact from whichever tier holds it"""
+    if artifact.data is not None:
+        headers = {"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"} if filename else None
+        return Response(content=artifact.data, media_type=artifact.media_type, headers=headers)
+    return FileResponse(artifact.path, media_type=artifact.media_type, filename=filename)
+
+
+def get_job_artifact(job: dict, name: str, missing_detail: str) -> Artifact:
+    """Look up a job's artifact, telling evicted jobs apart from missing files"""
+    if job.get("evicted"):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Job files were evicted to free storage"
+        )
+    
+    artifact = artifact_store.get(job["job_id"], name)
+    if artifact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=missing_detail
+        )
+    return artifact
+
+
+class StreamAborted(Exception):
+    """Raised by a streaming body to drop the connection mid-response"""
+
+
+class AbortableStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body can give up by raising `StreamAborted`.
+    The final body message is then never sent, so the server closes the
+    connection and the client sees an incomplete transfer, without the
+    traceback an unhandled exception would log for every client.
+    """
+
+    async def stream_response(self, send):
+        try:
+            await super().stream_response(send)
+        except StreamAborted:
+            pass
+
 
 async def cleanup_old_jobs():
     """Periodically remove jobs older than 1 hour"""
@@ -78,40 +189,48 @@ async def cleanup_old_jobs():
             current_time = datetime.utcnow()
             to_delete = []
             
-            for job_id, job in job_store.items():
+            for job in job_store.all():
                 created_at = datetime.fromisoformat(job["created_at"])
                 if (current_time - created_at).total_seconds() > 3600:
-                    to_delete.append(job_id)
+                    to_delete.append(job["job_id"])
             
             for job_id in to_delete:
                 logger.info(f"Cleaning up expired job: {job_id}")
-                # Remove files
-                for suffix in ["_input.wav", "_input.mp3", "_input.flac", "_input.m4a", "_input.ogg", "_output.wav"]:
-                    file_path = os.path.join(TEMP_DIR, f"{job_id}{suffix}")
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                del job_store[job_id]
+                await run_in_threadpool(artifact_store.delete_job, job_id)
+                job_store.delete(job_id)
+            
+            # Remove artifacts left behind by jobs that no longer exist
+            for job_id in artifact_store.job_ids():
+                if job_id not in job_store:
+                    logger.info(f"Cleaning up orphaned artifacts: {job_id}")
+                    await run_in_threadpool(artifact_store.delete_job, job_id)
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
             
         await asyncio.sleep(600) # Run every 10 mins
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Application lifespan manager"""
+def init_services():
+    """Load and warm the model, then build the denoise service"""
     global model_service, denoise_service
     
-    # Startup
-    logger.info("Starting AudioDenoise AI Backend...")
-    
     # Initialize model service
     model_service = ModelService()
     model_loaded = model_service.load_model()
     logger.info(f"Model loaded: {model_loaded}")
+    model_service.warmup()
     
     # Initialize denoise service
-    denoise_service = DenoiseService(model_service)
+    denoise_service = DenoiseService(model_service, artifact_store)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan manager"""
+    # Startup
+    logger.info("Starting AudioDenoise AI Backend...")
+    
+    init_services()
     
     # Start cleanup task
     asyncio.create_task(cleanup_old_jobs())
@@ -120,7 +239,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down...")
-    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    # The temp directory is shared between forked workers; the parent removes it
+    if not PREFORK:
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
 
 
 app = FastAPI(
@@ -170,11 +291,13 @@ async def health_check():
 @app.post("/api/denoise", tags=["Denoising"])
 async def denoise_audio(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    profile: bool = Form(False)
 ):
     """
     Upload and denoise an audio file.
     Returns a job ID for tracking the processing status.
+    Set `profile` to capture a performance trace for this job.
     """
     # Validate file type
     if not file.filename:
@@ -194,9 +317,10 @@ async def denoise_audio(
     
     # Generate job ID
     job_id = str(uuid.uuid4())
+    profiled = profile or random.random() < PROFILE_SAMPLE_RATE
     
     # Create job entry
-    job_store[job_id] = {
+    job_store.create({
         "job_id": job_id,
         "status": "processing",
         "progress": 0.0,
@@ -204,16 +328,20 @@ async def denoise_audio(
         "created_at": datetime.utcnow().isoformat(),
         "completed_at": None,
         "result": None,
-        "original_filename": file.filename
-    }
+        "original_filename": file.filename,
+        "profiled": profiled,
+        "stream_samples": 0
+    })
     
     # Save uploaded file
-    input_path = os.path.join(TEMP_DIR, f"{job_id}_input{file_ext}")
+    input_path = artifact_store.reserve(job_id, f"input{file_ext}")
     with open(input_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
+    artifact_store.commit(job_id, f"input{file_ext}")
+    await run_in_threadpool(artifact_store.enforce_quota)
     
     # Start background processing
-    background_tasks.add_task(process_audio_task, job_id, input_path)
+    background_tasks.add_task(process_audio_task, job_id, input_path, profiled)
     
     return JSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
@@ -221,34 +349,42 @@ async def denoise_audio(
             "job_id": job_id,
             "status": "processing",
             "message": "Audio processing started",
-            "check_status_url": f"/api/status/{job_id}"
+            "check_status_url": f"/api/status/{job_id}",
+            "stream_url": f"/api/stream/{job_id}"
         }
     )
 
 
-async def process_audio_task(job_id: str, input_path: str):
+async def process_audio_task(job_id: str, input_path: str, profiled: bool = False):
     """Background task for audio processing"""
     try:
         logger.info(f"Starting processing for job {job_id}")
         # Update progress
-        job_store[job_id]["progress"] = 10.0
-        job_store[job_id]["message"] = "Initializing engine..."
+        update_progress(job_id, 10.0, "Initializing engine...")
         
         # Perform denoising
         if denoise_service is None:
             raise RuntimeError("Denoise service not initialized")
             
+        profiler = None
+        if profiled:
+            profiler = JobProfiler(artifact_store.reserve(job_id, "profile"))
+            
         # Denoise service now handles loading and metrics
         result = await denoise_service.denoise(
             input_path=input_path,
-            output_path=os.path.join(TEMP_DIR, f"{job_id}_output.wav"),
+            output_path=artifact_store.reserve(job_id, "output.wav"),
             job_id=job_id,
-            progress_callback=lambda p, m: update_progress(job_id, p, m)
+            progress_callback=lambda p, m: update_progress(job_id, p, m),
+            profiler=profiler,
+            stream_callback=lambda n: job_store.update(job_id, {"stream_samples": n})
         )
+        if profiler:
+            result["profile_url"] = f"/api/jobs/{job_id}/profile"
         
         logger.info(f"Job {job_id} completed successfully")
         # Update job with results
-        job_store[job_id].update({
+        job_store.update(job_id, {
             "status": "completed",
             "progress": 100.0,
             "message": "Processing complete",
@@ -263,31 +399,34 @@ async def process_audio_task(job_id: str, input_path: str):
         logger.error(f"Error processing job {job_id}: {e}")
         import traceback
         traceback.print_exc()
-        job_store[job_id].update({
+        job_store.update(job_id, {
             "status": "error",
             "message": f"Error: {str(e)}",
             "completed_at": datetime.utcnow().isoformat()
         })
+    
+    # The finished job's artifacts now count against the quota
+    for name in ("output.wav", "profile.zip"):
+        artifact_store.commit(job_id, name)
+    await run_in_threadpool(artifact_store.enforce_quota)
 
 
 def update_progress(job_id: str, progress: float, message: str):
     """Update job progress"""
-    if job_id in job_store:
-        job_store[job_id]["progress"] = progress
-        job_store[job_id]["message"] = message
+    job_store.update(job_id, {"progress": progress, "message": message})
 
 
 @app.get("/api/status/{job_id}", response_model=ProcessingStatus, tags=["Denoising"])
 async def get_status(job_id: str):
     """Get processing status for a job"""
-    if job_id not in job_store:
+    job = job_store.get(job_id)
+    if job is None:
         logger.warning(f"Status requested for unknown job: {job_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job not found"
         )
     
-    job = job_store[job_id]
     logger.info(f"Job {job_id} status check: {job['status']} ({job['progress']}%)")
     
     return ProcessingStatus(
@@ -297,45 +436,102 @@ async def get_status(job_id: str):
         message=job["message"],
         created_at=job["created_at"],
         completed_at=job.get("completed_at"),
-        result=job.get("result")
+        result=job.get("result"),
+        evicted=job.get("evicted", False)
     )
 
 
 @app.get("/api/download/{job_id}", tags=["Denoising"])
 async def download_result(job_id: str):
     """Download the processed audio file"""
-    if job_id not in job_store:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job not found"
         )
     
-    job = job_store[job_id]
     if job["status"] != "completed":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Processing not complete"
         )
     
-    output_path = os.path.join(TEMP_DIR, f"{job_id}_output.wav")
-    if not os.path.exists(output_path):
+    artifact = get_job_artifact(job, "output.wav", "Output file not found")
+    return artifact_response(artifact, filename=f"denoised_{job['original_filename']}.wav")
+
+
+@app.get("/api/stream/{job_id}", tags=["Denoising"])
+async def stream_result(job_id: str):
+    """
+    Stream the processed audio while the job is still running.
+    Serves everything written so far, then follows the output until the job ends.
+    """
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Output file not found"
+            detail="Job not found"
         )
     
-    return FileResponse(
-        output_path,
-        media_type="audio/wav",
-        filename=f"denoised_{job['original_filename']}.wav"
-    )
+    if job["status"] == "error":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Processing failed"
+        )
+    
+    if job.get("evicted"):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Job files were evicted to free storage"
+        )
+    
+    async def follow_output():
+        yield streaming_wav_header(16000)
+        sent = 0
+        artifact = None
+        while True:
+            job = job_store.get(job_id)
+            if job is None or job["status"] == "error" or job.get("evicted"):
+                # Resetting the connection lets clients tell a failed job from
+                # a finished one instead of getting a short WAV
+                logger.warning(f"Aborting stream for job {job_id}: job failed, was deleted or evicted")
+                raise StreamAborted()
+            
+            watermark = job.get("stream_samples", 0)
+            if watermark > sent:
+                try:
+                    # Look the output up once per stream so hit counters and
+                    # recency count streams rather than polling rounds
+                    if artifact is None:
+                        artifact = artifact_store.get(job_id, "output.wav")
+                        if artifact is None:
+                            raise FileNotFoundError(f"Output of job {job_id} is gone")
+                    # A missing file means the job was deleted or evicted
+                    with open(artifact.path, "rb") as f:
+                        f.seek(WAV_HEADER_SIZE + sent * 2)
+                        data = f.read((watermark - sent) * 2)
+                except FileNotFoundError:
+                    logger.warning(f"Aborting stream for job {job_id}: output was removed")
+                    raise StreamAborted()
+                data = data[:len(data) // 2 * 2]
+                if data:
+                    sent += len(data) // 2
+                    yield data
+                    continue
+            
+            if job["status"] == "completed":
+                break
+            await asyncio.sleep(0.25)
+    
+    return AbortableStreamingResponse(follow_output(), media_type="audio/wav")
 
 
 @app.get("/api/metrics", response_model=MetricsResponse, tags=["Metrics"])
 async def get_metrics():
     """Get processing metrics"""
     completed_jobs = [
-        job for job in job_store.values()
+        job for job in job_store.all()
         if job["status"] == "completed" and job.get("result")
     ]
     
@@ -360,19 +556,36 @@ async def get_metrics():
     )
 
 
+@app.get("/api/metrics/artifacts", response_model=ArtifactStatsResponse, tags=["Metrics"])
+async def get_artifact_metrics():
+    """Get artifact store usage and eviction counters"""
+    return ArtifactStatsResponse(**artifact_store.stats())
+
+
 @app.get("/api/jobs/{job_id}/spec/{type}", tags=["Denoising"])
 async def get_spectrogram(job_id: str, type: str):
     """Get a spectrogram image for a job"""
-    if job_id not in job_store:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
         
-    filename = f"{job_id}_{'input' if type == 'input' else 'output'}_spec.png"
-    file_path = os.path.join(TEMP_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Spectrogram not found")
+    name = f"{'input' if type == 'input' else 'output'}_spec.png"
+    artifact = get_job_artifact(job, name, "Spectrogram not found")
+    return artifact_response(artifact)
+
+
+@app.get("/api/jobs/{job_id}/profile", tags=["Denoising"])
+async def get_profile(job_id: str):
+    """Download the profiling trace archive for a job"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
         
-    return FileResponse(file_path, media_type="image/png")
+    if not job.get("profiled"):
+        raise HTTPException(status_code=404, detail="Job was not profiled")
+        
+    artifact = get_job_artifact(job, "profile.zip", "Profile not available yet")
+    return artifact_response(artifact, filename=f"profile_{job_id}.zip")
 
 
 @app.delete("/api/jobs/{job_id}", tags=["Denoising"])
@@ -384,14 +597,11 @@ async def delete_job(job_id: str):
             detail="Job not found"
         )
     
-    # Remove files
-    for suffix in ["_input.wav", "_input.mp3", "_input.flac", "_output.wav", "_input_spec.png", "_output_spec.png"]:
-        file_path = os.path.join(TEMP_DIR, f"{job_id}{suffix}")
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    # Remove every artifact in the job's manifest
+    artifact_store.delete_job(job_id)
     
     # Remove job from store
-    del job_store[job_id]
+    job_store.delete(job_id)
     
     return {"message": "Job deleted successfully"}
 
@@ -400,4 +610,11 @@ if __name__ == "__main__":
     import uvicorn
     # Hugging Face Spaces uses port 7860 by default
     port = int(os.getenv("PORT", 7860))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if PREFORK:
+        from app.prefork import serve
+        try:
+            sys.exit(serve(app, host="0.0.0.0", port=port, workers=WORKERS))
+        finally:
+            shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
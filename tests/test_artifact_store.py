@@ -0,0 +1,201 @@
+"""
+Tests for the tiered artifact store
+"""
+
+import os
+import threading
+
+import pytest
+
+from app.services.artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(
+        str(tmp_path / "artifacts"),
+        quota_bytes=10_000,
+        memory_bytes=1500,
+        memory_item_bytes=1000
+    )
+
+
+def test_small_artifacts_stay_in_memory(store):
+    store.put_bytes("job", "small.png", b"x" * 500)
+    store.put_bytes("job", "large.png", b"y" * 2000)
+
+    assert store.get("job", "small.png").tier == "memory"
+    assert store.get("job", "large.png").tier == "disk"
+    assert store.usage() == {"memory": 500, "disk": 2000}
+
+
+def test_full_memory_tier_demotes_to_disk(store):
+    store.put_bytes("old", "spec.png", b"x" * 800)
+    store.put_bytes("new", "spec.png", b"y" * 800)
+
+    assert store.get("old", "spec.png").tier == "disk"
+    assert store.get("new", "spec.png").tier == "memory"
+    assert store.counters["demotions"] == 1
+    assert store.usage() == {"memory": 800, "disk": 800}
+
+
+def test_demotion_does_not_refresh_recency(store):
+    store.put_bytes("old", "spec.png", b"x" * 800)
+    store.put_bytes("new", "spec.png", b"y" * 800)  # demotes "old"
+
+    store.quota_bytes = 1000
+    store.enforce_quota()
+
+    assert store.manifest("old") == []
+    assert store.get("new", "spec.png") is not None
+    assert store.counters["evictions"] == 1
+    assert store.counters["evicted_bytes"] == 800
+
+
+def test_access_refreshes_recency(store):
+    store.put_bytes("a", "out.bin", b"x" * 2000)
+    store.put_bytes("b", "out.bin", b"y" * 2000)
+    store.get("a", "out.bin")
+
+    store.quota_bytes = 3000
+    store.enforce_quota()
+
+    assert store.get("a", "out.bin") is not None
+    assert store.get("b", "out.bin") is None
+
+
+def test_eviction_skips_busy_jobs_and_reports(tmp_path):
+    evicted = []
+    store = ArtifactStore(
+        str(tmp_path / "artifacts"),
+        quota_bytes=3000,
+        is_evictable=lambda job_id: job_id != "busy",
+        on_evict=evicted.append
+    )
+    store.put_bytes("busy", "out.bin", b"x" * 2000)
+    store.put_bytes("done", "out.bin", b"y" * 2000)
+
+    assert evicted == ["done"]
+    assert store.get("busy", "out.bin") is not None
+    assert not os.path.exists(store.disk_path("done", "out.bin"))
+
+
+def test_reserved_files_are_sized_on_commit(store):
+    path = store.reserve("job", "output.wav")
+    with open(path, "wb") as f:
+        f.write(b"z" * 1234)
+    assert store.usage()["disk"] == 0
+
+    assert store.commit("job", "output.wav") == 1234
+    assert store.manifest("job") == [{"name": "output.wav", "tier": "disk", "size": 1234}]
+    assert store.usage()["disk"] == 1234
+
+
+def test_delete_job_removes_every_tier(store):
+    store.put_bytes("job", "spec.png", b"x" * 500)
+    store.put_bytes("job", "big.bin", b"y" * 2000)
+    with open(store.reserve("job", "input.ogg"), "wb") as f:
+        f.write(b"z" * 100)
+    store.commit("job", "input.ogg")
+
+    assert store.delete_job("job") == 2600
+    assert store.manifest("job") == []
+    assert store.usage() == {"memory": 0, "disk": 0}
+    assert not os.path.exists(os.path.join(store.root, "job"))
+
+
+def test_job_ids_include_orphaned_directories(store):
+    os.makedirs(os.path.join(store.root, "orphan"))
+    store.put_bytes("job", "spec.png", b"x" * 10)
+
+    assert store.job_ids() == ["job", "orphan"]
+
+
+def test_concurrent_quota_passes_evict_each_job_once(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts"), quota_bytes=10 ** 9)
+    for index in range(20):
+        store.put_bytes(f"job{index}", "out.bin", b"x" * 1000)
+    store.quota_bytes = 5000
+
+    threads = [threading.Thread(target=store.enforce_quota) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.counters["evictions"] == 15
+    assert store.counters["evicted_bytes"] == 15000
+    assert store.usage()["disk"] == 5000
+
+
+def shared_store(root: str, **kwargs) -> ArtifactStore:
+    return ArtifactStore(root, quota_bytes=10 ** 9, memory_bytes=1500, memory_item_bytes=1000, shared=True, **kwargs)
+
+
+def set_recency(store: ArtifactStore, job_id: str, seconds: int):
+    os.utime(os.path.join(store.root, job_id), (seconds, seconds))
+
+
+def test_shared_stores_see_each_others_usage(tmp_path):
+    root = str(tmp_path / "artifacts")
+    worker_a = shared_store(root)
+    worker_b = shared_store(root)
+
+    worker_a.put_bytes("a", "spec.png", b"x" * 500)
+    worker_b.put_bytes("b", "out.bin", b"y" * 2000)
+
+    assert worker_a.get("a", "spec.png").tier == "disk"
+    assert worker_a.usage() == {"memory": 0, "disk": 2500}
+    assert worker_b.manifest("a") == [{"name": "spec.png", "tier": "disk", "size": 500}]
+
+    worker_b.delete_job("a")
+    assert worker_a.usage() == {"memory": 0, "disk": 2000}
+    assert worker_a.stats()["jobs"] == 1
+
+
+def test_shared_quota_covers_every_process(tmp_path):
+    root = str(tmp_path / "artifacts")
+    evicted = []
+    worker_a = shared_store(root, on_evict=evicted.append)
+    worker_b = shared_store(root)
+
+    worker_a.put_bytes("old", "out.bin", b"x" * 2000)
+    worker_b.put_bytes("new", "out.bin", b"y" * 2000)
+    set_recency(worker_a, "old", 1000)
+    set_recency(worker_a, "new", 2000)
+
+    worker_a.quota_bytes = 3000
+    worker_a.enforce_quota()
+
+    assert evicted == ["old"]
+    assert worker_b.job_ids() == ["new"]
+    assert worker_b.usage()["disk"] == 2000
+
+
+def test_shared_access_refreshes_recency_for_other_processes(tmp_path):
+    root = str(tmp_path / "artifacts")
+    worker_a = shared_store(root)
+    worker_b = shared_store(root)
+
+    worker_a.put_bytes("a", "out.bin", b"x" * 2000)
+    worker_a.put_bytes("b", "out.bin", b"y" * 2000)
+    set_recency(worker_a, "a", 1000)
+    set_recency(worker_a, "b", 2000)
+    worker_b.get("a", "out.bin")
+
+    worker_a.quota_bytes = 3000
+    worker_a.enforce_quota()
+
+    assert worker_a.job_ids() == ["a"]
+
+
+def test_shared_usage_includes_files_still_being_written(tmp_path):
+    store = shared_store(str(tmp_path / "artifacts"))
+    trace_dir = store.reserve("job", "profile")
+    os.makedirs(os.path.join(trace_dir, "tensorflow"))
+    with open(os.path.join(trace_dir, "tensorflow", "trace.pb"), "wb") as f:
+        f.write(b"t" * 300)
+    with open(store.reserve("job", "output.wav"), "wb") as f:
+        f.write(b"w" * 700)
+
+    assert store.usage()["disk"] == 1000
@@ -0,0 +1,67 @@
+"""
+Tests for the job stores
+"""
+
+import os
+
+import pytest
+
+from app.services.job_store import FileJobStore, InMemoryJobStore
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return FileJobStore(str(tmp_path / "jobs"))
+
+
+def make_job(job_id: str) -> dict:
+    return {"job_id": job_id, "status": "processing", "progress": 0.0}
+
+
+def test_create_get_update_delete(store):
+    store.create(make_job("a"))
+    assert "a" in store
+    assert store.get("a")["status"] == "processing"
+
+    store.update("a", {"status": "completed", "progress": 100.0})
+    job = store.get("a")
+    assert job["status"] == "completed"
+    assert job["progress"] == 100.0
+
+    store.delete("a")
+    assert "a" not in store
+    assert store.get("a") is None
+
+
+def test_get_returns_snapshot(store):
+    store.create(make_job("a"))
+    store.get("a")["status"] = "error"
+    assert store.get("a")["status"] == "processing"
+
+
+def test_update_and_delete_missing_job_are_ignored(store):
+    store.update("missing", {"status": "completed"})
+    store.delete("missing")
+    assert store.get("missing") is None
+    assert store.all() == []
+
+
+def test_all(store):
+    store.create(make_job("a"))
+    store.create(make_job("b"))
+    assert sorted(job["job_id"] for job in store.all()) == ["a", "b"]
+
+
+def test_file_store_is_shared_between_processes(tmp_path):
+    store = FileJobStore(str(tmp_path / "jobs"))
+    store.create(make_job("a"))
+
+    pid = os.fork()
+    if pid == 0:
+        FileJobStore(str(tmp_path / "jobs")).update("a", {"status": "completed"})
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert store.get("a")["status"] == "completed"
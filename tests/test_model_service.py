@@ -0,0 +1,69 @@
+"""
+Tests for loading the model in workers forked after TensorFlow was imported
+"""
+
+import os
+import sys
+import time
+import signal
+import subprocess
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, "model", "unet_denoiser.h5")
+
+REFERENCE_SCRIPT = """
+import sys
+import numpy as np
+from app.services.model_service import ModelService
+service = ModelService(sys.argv[1])
+service.load_model()
+dummy = np.linspace(0, 1, 257 * 128, dtype=np.float32).reshape(1, 257, 128, 1)
+np.save(sys.argv[2], np.asarray(service.predict(dummy)))
+"""
+
+
+def wait_for_child(pid: int, timeout: float) -> int:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return os.waitstatus_to_exitcode(status)
+        time.sleep(0.1)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    pytest.fail("Forked worker hung while running inference")
+
+
+def test_forked_worker_loads_and_predicts(tmp_path):
+    # Like the pre-fork parent, this process imports TensorFlow but never runs
+    # an op; the reference result comes from a separate process
+    import tensorflow  # noqa: F401
+
+    reference_path = str(tmp_path / "reference.npy")
+    subprocess.run(
+        [sys.executable, "-c", REFERENCE_SCRIPT, MODEL_PATH, reference_path],
+        cwd=ROOT, check=True
+    )
+
+    output_path = str(tmp_path / "forked.npy")
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            from app.services.model_service import ModelService
+            service = ModelService(MODEL_PATH)
+            service.load_model()
+            service.warmup()
+            dummy = np.linspace(0, 1, 257 * 128, dtype=np.float32).reshape(1, 257, 128, 1)
+            np.save(output_path, np.asarray(service.predict(dummy)))
+            code = 0
+        finally:
+            os._exit(code)
+
+    assert wait_for_child(pid, timeout=180) == 0
+    np.testing.assert_allclose(np.load(output_path), np.load(reference_path), rtol=1e-5, atol=1e-6)
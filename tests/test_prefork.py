@@ -0,0 +1,45 @@
+"""
+Tests for the pre-fork server
+"""
+
+import pytest
+
+pytest.importorskip("uvicorn")
+
+from app import prefork
+from app.prefork import RestartLimiter
+
+
+def test_restart_limiter_caps_restarts_within_window():
+    limiter = RestartLimiter(max_restarts=2, window=10.0)
+    assert limiter.allow(now=0.0)
+    assert limiter.allow(now=1.0)
+    assert not limiter.allow(now=2.0)
+
+
+def test_restart_limiter_forgets_old_restarts():
+    limiter = RestartLimiter(max_restarts=2, window=10.0)
+    assert limiter.allow(now=0.0)
+    assert limiter.allow(now=1.0)
+    assert limiter.allow(now=11.5)
+
+
+def test_serve_stops_when_workers_keep_crashing(monkeypatch):
+    def crash(app, sock):
+        raise RuntimeError("lifespan failed")
+
+    monkeypatch.setattr(prefork, "_run_worker", crash)
+    preloaded = []
+
+    exit_code = prefork.serve(
+        app=None,
+        host="127.0.0.1",
+        port=0,
+        workers=2,
+        preload=lambda: preloaded.append(True),
+        restart_delay=0.0,
+        restart_limiter=RestartLimiter(max_restarts=3, window=60.0)
+    )
+
+    assert exit_code == 1
+    assert preloaded == [True]
@@ -0,0 +1,31 @@
+"""
+Tests for per-job profiling traces
+"""
+
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from app.services.profiling_service import JobProfiler
+
+
+def test_stop_writes_archive_and_removes_trace_dir(tmp_path):
+    trace_dir = str(tmp_path / "profile")
+    profiler = JobProfiler(trace_dir)
+
+    profiler.start()
+    for step in range(2):
+        with profiler.trace_predict(step):
+            sum(range(1000))
+    archive_path = profiler.stop()
+
+    assert archive_path == trace_dir + ".zip"
+    assert not os.path.exists(trace_dir)
+    with zipfile.ZipFile(archive_path) as archive:
+        names = archive.namelist()
+    assert "python.prof" in names
+    assert "python_stats.txt" in names
+    assert "predict_timings.json" in names
@@ -0,0 +1,115 @@
+"""
+Tests for incremental reconstruction, the output limiter and WAV streaming
+"""
+
+import os
+import wave
+
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+from app.services.streaming import (
+    WAV_HEADER_SIZE,
+    LookAheadLimiter,
+    StreamingISTFT,
+    StreamingWavWriter,
+    streaming_wav_header,
+)
+
+N_FFT = 512
+HOP = 128
+
+
+def stream_istft(stft: np.ndarray, chunk_frames: int) -> np.ndarray:
+    istft = StreamingISTFT(N_FFT, HOP, stft.shape[1])
+    blocks = [
+        istft.push(stft[:, start:start + chunk_frames])
+        for start in range(0, stft.shape[1], chunk_frames)
+    ]
+    blocks.append(istft.flush())
+    return np.concatenate(blocks)
+
+
+def run_limiter(signal: np.ndarray, block_size: int, **kwargs) -> np.ndarray:
+    limiter = LookAheadLimiter(16000, **kwargs)
+    blocks = [
+        limiter.process(signal[start:start + block_size])
+        for start in range(0, len(signal), block_size)
+    ]
+    blocks.append(limiter.flush())
+    return np.concatenate(blocks)
+
+
+@pytest.mark.parametrize("length", [1000, 16000 * 3 + 77, 128 * 128 * 2])
+@pytest.mark.parametrize("chunk_frames", [1, 7, 128])
+def test_streaming_istft_matches_librosa(length, chunk_frames):
+    audio = np.random.default_rng(0).standard_normal(length)
+    stft = librosa.stft(audio, n_fft=N_FFT, hop_length=HOP)
+
+    expected = librosa.istft(stft, hop_length=HOP)
+    actual = stream_istft(stft, chunk_frames)
+
+    assert len(actual) == len(expected)
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_streaming_istft_emits_before_flush():
+    audio = np.random.default_rng(1).standard_normal(16000)
+    stft = librosa.stft(audio, n_fft=N_FFT, hop_length=HOP)
+    istft = StreamingISTFT(N_FFT, HOP, stft.shape[1])
+
+    first = istft.push(stft[:, :32])
+    assert len(first) == 32 * HOP - N_FFT // 2
+
+
+def test_limiter_respects_ceiling():
+    loud = np.random.default_rng(2).standard_normal(48000) * 2.0
+    out = run_limiter(loud, 4096, ceiling_db=-1.0)
+
+    assert len(out) == len(loud)
+    assert np.max(np.abs(out)) <= 10 ** (-1 / 20) + 1e-6
+
+
+def test_limiter_passes_quiet_audio_through():
+    quiet = np.random.default_rng(3).standard_normal(20000) * 0.1
+    out = run_limiter(quiet, 4096)
+
+    np.testing.assert_allclose(out, quiet, atol=1e-6)
+
+
+def test_limiter_output_does_not_depend_on_block_size():
+    signal = np.random.default_rng(4).standard_normal(30000) * 1.5
+    reference = run_limiter(signal, len(signal), gain_db=3.0)
+
+    for block_size in [1, 100, 161, 4096]:
+        np.testing.assert_allclose(run_limiter(signal, block_size, gain_db=3.0), reference, atol=1e-6)
+
+
+def test_wav_writer_is_readable_while_growing(tmp_path):
+    path = str(tmp_path / "out.wav")
+    writer = StreamingWavWriter(path, 16000)
+
+    writer.write(np.full(1000, 0.5))
+    assert os.path.getsize(path) == WAV_HEADER_SIZE + 1000 * 2
+    assert writer.samples_written == 1000
+
+    writer.write(np.full(500, -0.5))
+    writer.close()
+
+    with wave.open(path, "rb") as wav:
+        assert wav.getnframes() == 1500
+        assert wav.getframerate() == 16000
+        samples = np.frombuffer(wav.readframes(1500), dtype="<i2")
+    assert samples[0] == round(0.5 * 32767)
+    assert samples[-1] == round(-0.5 * 32767)
+
+
+def test_streaming_wav_header():
+    header = streaming_wav_header(16000)
+
+    assert len(header) == WAV_HEADER_SIZE
+    assert header[:4] == b"RIFF"
+    assert header[8:16] == b"WAVEfmt "
+    assert header[36:40] == b"data"